@@ -8,15 +8,50 @@ System for monitoring GPU resource usage by LXC containers in Proxmox environmen
 
 import time
 import json
-import subprocess
+import atexit
+import gzip
+import math
 import os
+import re
+import selectors
+import socket
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Optional, Union
 from urllib.parse import urlparse
 import sys
 
+# Use orjson (C extension) for JSON serialization if it is installed;
+# json_dumps returns UTF-8 encoded bytes ready to be sent
+try:
+    import orjson
+    
+    json_dumps = orjson.dumps
+except ImportError:
+    def json_safe(obj):
+        """Convert data for the json module the way orjson serializes it"""
+        if isinstance(obj, float):
+            # orjson writes NaN as null, JSON.parse rejects a bare NaN token
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: json_safe(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [json_safe(value) for value in obj]
+        if is_dataclass(obj):
+            # Shallow copy of the fields: asdict() deep-copies values and fails on nvitop's NA
+            return {field.name: json_safe(getattr(obj, field.name)) for field in fields(obj)}
+        return obj
+    
+    def json_dumps(obj):
+        return json.dumps(json_safe(obj)).encode('utf-8')
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,289 +64,414 @@ logger = logging.getLogger('proxmox_gml')
 
 # Web server port
 PORT = 8001
+# Number of HTTP worker threads
+HTTP_WORKERS = 8
+# A new connection is handed to a worker only once its request arrives; connections
+# that send nothing within REQUEST_TIMEOUT seconds are closed without taking a worker
+REQUEST_TIMEOUT = 5
+# When this many connections wait for a request, the one waiting longest is closed
+# to make room, so a flood of silent connections can't lock new clients out
+MAX_IDLE_CONNECTIONS = 256
+# Connections with a request that wait for a free worker; beyond this the oldest is dropped
+MAX_QUEUED_REQUESTS = 64
+# Between requests keep-alive connections wait in the same watcher, not in a worker,
+# and are closed after KEEPALIVE_TIMEOUT idle seconds; they may take at most
+# MAX_KEEPALIVE_CONNECTIONS watcher places, beyond that the oldest of them is closed
+KEEPALIVE_TIMEOUT = 30
+MAX_KEEPALIVE_CONNECTIONS = MAX_IDLE_CONNECTIONS // 2
+# Maximum number of open live page update streams (/events)
+EVENT_STREAMS = 64
 
 # Path to nvitop virtual environment
 NVITOP_VENV = '/opt/nvitop-venv'
 NVITOP_PYTHON = f"{NVITOP_VENV}/bin/python"
 
-# Cache for collected data
+# Latest collected data, refreshed by the background collector thread
 last_data = {}
-last_update_time = 0
 update_interval = 5  # seconds
 
-# Check if nvitop virtual environment exists
-if not os.path.exists(NVITOP_VENV):
-    logger.error(f"nvitop virtual environment not found at {NVITOP_VENV}")
+# Adaptive refresh: the interval doubles up to the maximum after several idle refreshes
+# and halves down to the minimum when GPU load or the process set changes
+min_update_interval = 1  # seconds
+max_update_interval = 30  # seconds
+idle_refreshes_before_backoff = 3
+
+# /healthz reports the monitor unhealthy when the data is older than this
+health_max_age = 3 * max_update_interval  # seconds
+
+# NVML device handles and static GPU information, cached across refreshes
+_DEVICES = []
+_STATIC_GPU_INFO = {}
+# Devices that run processes: MIG instances for MIG-enabled GPUs, the GPU itself otherwise
+_PROCESS_DEVICES = []
+
+# Container lookups, cached across refreshes:
+# container ID -> (config mtime, container name)
+_CT_NAME_CACHE = {}
+# PID -> (cgroup mtime, (container ID, service name) or None)
+_PID_CONTAINER_CACHE = {}
+
+# cgroup path patterns: /lxc/<ID>/... and system.slice/<name>.service
+_LXC_RE = re.compile(r'/lxc/([0-9]+)/')
+_SVC_RE = re.compile(r'system\.slice/([^/]+)\.service')
+
+# Worker pool for container lookups, kept alive across refreshes
+_CT_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ct-lookup')
+
+# Import nvitop in-process; if it is not available in the current interpreter,
+# re-execute the script once with the Python from the nvitop virtual environment
+try:
+    from nvitop import Device, GpuProcess, NA, NaType, bytes2human, libnvml
+    from nvitop import __version__ as nvitop_version
+except ImportError:
+    # The environment marker keeps the re-exec from looping when the venv path
+    # is spelled differently (trailing slash, symlink) from sys.prefix
+    if (not os.environ.get('PROXMOX_GML_REEXEC')
+            and os.path.realpath(sys.prefix) != os.path.realpath(NVITOP_VENV)
+            and os.path.exists(NVITOP_PYTHON)):
+        os.environ['PROXMOX_GML_REEXEC'] = '1'
+        os.execv(NVITOP_PYTHON, [NVITOP_PYTHON] + sys.argv)
+    logger.error(f"nvitop is not available (virtual environment: {NVITOP_VENV})")
     logger.error("Please install nvitop: python -m pip install nvitop")
     sys.exit(1)
 
-def run_nvitop_script(script):
-    """Run Python script with nvitop's Python"""
+def get_container_name(container_id):
+    """Get container hostname from its Proxmox config file"""
+    proxmox_conf = f"/etc/pve/lxc/{container_id}.conf"
     try:
-        cmd = [NVITOP_PYTHON, "-c", script]
-        output = subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode()
-        return output
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error executing nvitop script: {e}")
-        logger.error(f"Output: {e.output.decode() if hasattr(e, 'output') else 'No output'}")
-        return None
+        conf_mtime = os.stat(proxmox_conf).st_mtime_ns
+    except OSError:
+        return 'Unknown'
+    
+    # Re-read the config only if it was changed since the last lookup
+    cached = _CT_NAME_CACHE.get(container_id)
+    if cached and cached[0] == conf_mtime:
+        return cached[1]
+    
+    container_name = 'Unknown'
+    with open(proxmox_conf, 'r') as f:
+        for line in f:
+            # Snapshot sections follow the current config, stop there
+            if line.startswith('['):
+                break
+            if line.startswith('hostname:'):
+                container_name = line[len('hostname:'):].strip() or 'Unknown'
+                break
+    
+    _CT_NAME_CACHE[container_id] = (conf_mtime, container_name)
+    return container_name
+
+def parse_cgroup(cgroup_file):
+    """Extract container ID and service name from a process cgroup file"""
+    # Raw read without buffered/text file wrappers; cgroup files are small
+    fd = os.open(cgroup_file, os.O_RDONLY)
+    try:
+        cgroup_content = os.read(fd, 65536).decode('utf-8', 'replace')
+    finally:
+        os.close(fd)
+    
+    # Look for LXC container patterns (cheap substring check before regex)
+    if '/lxc/' in cgroup_content:
+        # Extract container ID from /lxc/ID/... pattern
+        container_match = _LXC_RE.search(cgroup_content)
+        if container_match:
+            # Extract service name if available
+            service_match = _SVC_RE.search(cgroup_content)
+            service_name = service_match.group(1) if service_match else None
+            
+            return container_match.group(1), service_name
+    
+    return None
 
 def get_container_info(pid):
     """Get container information by process PID"""
     try:
         # Read cgroup file directly
         cgroup_file = f"/proc/{pid}/cgroup"
-        if not os.path.exists(cgroup_file):
-            return None
+        try:
+            cgroup_mtime = os.stat(cgroup_file).st_mtime_ns
             
-        with open(cgroup_file, 'r') as f:
-            cgroup_content = f.read().strip()
+            # Parse cgroup only for new processes (a reused PID gets a new mtime)
+            cached = _PID_CONTAINER_CACHE.get(pid)
+            if cached and cached[0] == cgroup_mtime:
+                container = cached[1]
+            else:
+                container = parse_cgroup(cgroup_file)
+                _PID_CONTAINER_CACHE[pid] = (cgroup_mtime, container)
+        except FileNotFoundError:
+            # Process has exited
+            _PID_CONTAINER_CACHE.pop(pid, None)
+            return None
         
-        # Look for LXC container patterns
-        if '/lxc/' in cgroup_content:
-            # Extract container ID from /lxc/ID/... pattern
-            import re
-            container_match = re.search(r'/lxc/([0-9]+)/', cgroup_content)
-            if container_match:
-                container_id = container_match.group(1)
-                
-                # Extract service name if available
-                service_match = re.search(r'system\.slice/([^/]+)\.service', cgroup_content)
-                service_name = service_match.group(1) if service_match else None
-                
-                container_name = 'Unknown'
-                # If we got numeric ID, try to get container name
-                if container_id.isdigit():
-                    # Check Proxmox config file
-                    proxmox_conf = f"/etc/pve/lxc/{container_id}.conf"
-                    if os.path.exists(proxmox_conf):
-                        try:
-                            cmd = f"grep -E '^hostname:' {proxmox_conf} | cut -d' ' -f2 || echo 'Unknown'"
-                            container_name = subprocess.check_output(cmd, shell=True).decode().strip()
-                        except Exception:
-                            pass
-                    
-                    # Check with pct command in Proxmox
-                    if container_name == 'Unknown' and os.path.exists("/usr/sbin/pct"):
-                        try:
-                            cmd = f"pct list | grep {container_id} | awk '{{print $3}}' || echo 'Unknown'"
-                            pct_name = subprocess.check_output(cmd, shell=True).decode().strip()
-                            if pct_name != 'Unknown':
-                                container_name = pct_name
-                        except Exception:
-                            pass
-                    
-                    # If we still don't have a name but have a service name, use it
-                    if container_name == 'Unknown' and service_name:
-                        container_name = service_name
-                        
-                return {
-                    'id': container_id,
-                    'name': container_name
-                }
+        if not container:
+            return None
         
-        return None
+        container_id, service_name = container
+        container_name = get_container_name(container_id)
+        
+        # If we don't have a name but have a service name, use it
+        if container_name == 'Unknown' and service_name:
+            container_name = service_name
+        
+        return {
+            'id': container_id,
+            'name': container_name
+        }
     except Exception as e:
         logger.error(f"Error getting container info: {e}")
         return None
 
-def collect_data():
-    """Collect all data about GPUs and processes"""
-    global last_data, last_update_time
+def init_devices():
+    """Enumerate GPUs and cache their handles and static information"""
+    global _DEVICES, _PROCESS_DEVICES
     
-    # If data was collected recently, return cached data
-    current_time = time.time()
-    if current_time - last_update_time < update_interval and last_data:
-        return last_data
-    
-    logger.info("Collecting data about GPUs and processes...")
-    
-    # Get GPU and process information
-    gpu_script = """
-import json
-from nvitop import Device, take_snapshots
-
-# Get GPU information
-devices = Device.all()
-gpu_info = []
-
-for device in devices:
-    # Базовая информация о GPU
-    gpu_data = {
-        'index': device.index,
-        'name': device.name(),
-        'uuid': device.uuid(),
-        'utilization': device.gpu_utilization(),
-        'memory_used': device.memory_used(),
-        'memory_used_human': device.memory_used_human(),
-        'memory_total': device.memory_total(),
-        'memory_total_human': device.memory_total_human(),
-        'memory_percent': device.memory_percent(),
-        'temperature': device.temperature(),
-        'power_usage': device.power_usage(),
-        'power_limit': device.power_limit()
-    }
+    devices = Device.all()
+    static_info = {}
+    process_devices = []
     
-    # Дополнительная информация о GPU
-    try:
-        # Частоты GPU
-        gpu_data['graphics_clock'] = device.graphics_clock()
-        gpu_data['memory_clock'] = device.memory_clock()
-        gpu_data['sm_clock'] = device.sm_clock()
-        
-        # Максимальные частоты
-        gpu_data['max_graphics_clock'] = device.max_graphics_clock()
-        gpu_data['max_memory_clock'] = device.max_memory_clock()
-        gpu_data['max_sm_clock'] = device.max_sm_clock()
+    for device in devices:
+        process_devices.extend(device.mig_devices() or [device])
         
-        # PCIe пропускная способность
-        gpu_data['pcie_tx'] = device.pcie_tx_throughput()
-        gpu_data['pcie_rx'] = device.pcie_rx_throughput()
-        # Методы форматирования нужно вызывать, а не передавать сами методы
-        if hasattr(device, 'pcie_tx_throughput_human') and callable(getattr(device, 'pcie_tx_throughput_human')):
-            gpu_data['pcie_tx_human'] = device.pcie_tx_throughput_human()
-            gpu_data['pcie_rx_human'] = device.pcie_rx_throughput_human()
+        # Неизменяемая информация о GPU
+        info = {
+            'index': device.index,
+            'name': device.name(),
+            'uuid': device.uuid()
+        }
         
-        # NVLink пропускная способность (если доступна)
-        if hasattr(device, 'nvlink_tx_throughput') and callable(getattr(device, 'nvlink_tx_throughput')):
-            gpu_data['nvlink_tx'] = device.nvlink_tx_throughput()
-            gpu_data['nvlink_rx'] = device.nvlink_rx_throughput()
-            # Вызываем методы для получения строковых значений
-            if hasattr(device, 'nvlink_tx_throughput_human') and callable(getattr(device, 'nvlink_tx_throughput_human')):
-                gpu_data['nvlink_tx_human'] = device.nvlink_tx_throughput_human()
-                gpu_data['nvlink_rx_human'] = device.nvlink_rx_throughput_human()
-            
-        # Производительность энкодера/декодера видео
-        if hasattr(device, 'encoder_utilization') and callable(getattr(device, 'encoder_utilization')):
-            gpu_data['encoder_utilization'] = device.encoder_utilization()
-            gpu_data['decoder_utilization'] = device.decoder_utilization()
+        try:
+            # Максимальные частоты
+            info['max_graphics_clock'] = device.max_graphics_clock()
+            info['max_memory_clock'] = device.max_memory_clock()
+            info['max_sm_clock'] = device.max_sm_clock()
             
-        # Информация о режиме и драйвере
-        gpu_data['compute_mode'] = device.compute_mode()
-        gpu_data['driver_version'] = device.driver_version()
-    except Exception as e:
-        print(f"Error getting additional GPU info: {e}")
+            # Информация о режиме и драйвере
+            info['compute_mode'] = device.compute_mode()
+            info['driver_version'] = device.driver_version()
+        except Exception as e:
+            logger.error(f"Error getting static GPU info: {e}")
+        
+        static_info[device.index] = info
+    
+    _STATIC_GPU_INFO.clear()
+    _STATIC_GPU_INFO.update(static_info)
+    _PROCESS_DEVICES = process_devices
+    _DEVICES = devices
+    logger.info(f"Found {len(devices)} GPU(s)")
+
+def query_nvitop():
+    """Query GPU and process information from NVML through nvitop"""
+    global _DEVICES
     
-    gpu_info.append(gpu_data)
+    if not _DEVICES:
+        init_devices()
+    
+    try:
+        return query_devices()
+    except libnvml.NVMLError:
+        # Device set may have changed (driver reload, GPU lost) - re-enumerate on next refresh
+        _DEVICES = []
+        raise
 
-# Get process information
-snapshots = take_snapshots()
-processes = []
+def throughput_human(value):
+    """Format throughput in KiB/s the same way as nvitop *_throughput_human() methods"""
+    if libnvml.nvmlCheckReturn(value, int):
+        return f"{bytes2human(value * 1024)}/s"
+    return NA
 
-for process in snapshots.gpu_processes:
-    # Базовая информация о процессе
-    process_info = {
-        'pid': process.pid,
-        'command': process.command,
-        'username': process.username,
-        'gpu_index': process.device.index,
-        'gpu_memory': process.gpu_memory,
-        'gpu_memory_human': process.gpu_memory_human
+@dataclass(slots=True)
+class ProcessRecord:
+    """GPU process snapshot; optional fields stay None when nvitop can't provide them, failsafe snapshots may hold NA"""
+    pid: int
+    command: str
+    username: str
+    gpu_index: int
+    gpu_memory: Union[int, NaType]
+    gpu_memory_human: str
+    gpu_utilization: Union[int, NaType, None] = None
+    running_time: Union[float, NaType, None] = None
+    running_time_human: Optional[str] = None
+    cpu_percent: Union[float, NaType, None] = None
+    host_memory: Union[int, NaType, None] = None
+    host_memory_human: Optional[str] = None
+    host_memory_percent: Union[float, NaType, None] = None
+    status: Optional[str] = None
+    is_running: Union[bool, NaType, None] = None
+    container_id: Optional[str] = None
+    container_name: Optional[str] = None
+
+def query_devices():
+    """Query dynamic GPU and process information for the cached devices"""
+    # Get GPU information
+    gpu_info = []
+
+    for device in _DEVICES:
+        # oneshot() fetches memory, utilization, clocks and power with one NVML call each
+        # and serves the individual getters below from that cache
+        with device.oneshot():
+            # Базовая информация о GPU
+            gpu_data = {
+                'utilization': device.gpu_utilization(),
+                'memory_used': device.memory_used(),
+                'memory_used_human': device.memory_used_human(),
+                'memory_total': device.memory_total(),
+                'memory_total_human': device.memory_total_human(),
+                'memory_percent': device.memory_percent(),
+                'temperature': device.temperature(),
+                'power_usage': device.power_usage(),
+                'power_limit': device.power_limit()
+            }
+
+            # Дополнительная информация о GPU
+            try:
+                # Частоты GPU
+                gpu_data['graphics_clock'] = device.graphics_clock()
+                gpu_data['memory_clock'] = device.memory_clock()
+                gpu_data['sm_clock'] = device.sm_clock()
+
+                # PCIe пропускная способность; текстовые значения форматируем из уже
+                # полученных чисел, а не повторным запросом счетчиков
+                gpu_data['pcie_tx'] = device.pcie_tx_throughput()
+                gpu_data['pcie_rx'] = device.pcie_rx_throughput()
+                gpu_data['pcie_tx_human'] = throughput_human(gpu_data['pcie_tx'])
+                gpu_data['pcie_rx_human'] = throughput_human(gpu_data['pcie_rx'])
+
+                # NVLink пропускная способность (если доступна), значения по каждому линку
+                if hasattr(device, 'nvlink_tx_throughput') and callable(getattr(device, 'nvlink_tx_throughput')):
+                    gpu_data['nvlink_tx'] = device.nvlink_tx_throughput()
+                    gpu_data['nvlink_rx'] = device.nvlink_rx_throughput()
+                    gpu_data['nvlink_tx_human'] = [throughput_human(tx) for tx in gpu_data['nvlink_tx']]
+                    gpu_data['nvlink_rx_human'] = [throughput_human(rx) for rx in gpu_data['nvlink_rx']]
+
+                # Производительность энкодера/декодера видео
+                if hasattr(device, 'encoder_utilization') and callable(getattr(device, 'encoder_utilization')):
+                    gpu_data['encoder_utilization'] = device.encoder_utilization()
+                    gpu_data['decoder_utilization'] = device.decoder_utilization()
+            except Exception as e:
+                logger.error(f"Error getting additional GPU info: {e}")
+
+        gpu_info.append({**_STATIC_GPU_INFO[device.index], **gpu_data})
+
+    # Get process information: one process sweep per device and a single batched snapshot,
+    # without take_snapshots() re-enumerating and snapshotting every device again
+    gpu_processes = [process for device in _PROCESS_DEVICES for process in device.processes().values()]
+    processes = [process_record(process) for process in GpuProcess.take_snapshots(gpu_processes, failsafe=True)]
+
+    return {
+        'gpu_info': gpu_info,
+        'processes': processes
     }
+
+def process_record(process):
+    """Build a ProcessRecord from an nvitop process snapshot"""
+    # Базовая информация о процессе
+    record = ProcessRecord(
+        pid=process.pid,
+        command=process.command,
+        username=process.username,
+        gpu_index=process.device.index,
+        gpu_memory=process.gpu_memory,
+        gpu_memory_human=process.gpu_memory_human
+    )
     
     # Дополнительная информация о процессе
     try:
         # GPU загрузка процесса
         if hasattr(process, 'gpu_sm_utilization'):
-            process_info['gpu_utilization'] = process.gpu_sm_utilization
+            record.gpu_utilization = process.gpu_sm_utilization
         
         # Время работы процесса
-        process_info['running_time'] = process.running_time_in_seconds
-        process_info['running_time_human'] = process.running_time_human
+        record.running_time = process.running_time_in_seconds
+        record.running_time_human = process.running_time_human
         
         # Использование CPU и памяти хоста
-        process_info['cpu_percent'] = process.cpu_percent
-        process_info['host_memory'] = process.host_memory
-        process_info['host_memory_human'] = process.host_memory_human
-        process_info['host_memory_percent'] = process.host_memory_percent
+        record.cpu_percent = process.cpu_percent
+        record.host_memory = process.host_memory
+        record.host_memory_human = process.host_memory_human
+        record.host_memory_percent = process.host_memory_percent
         
         # Статус процесса
-        process_info['status'] = process.status
-        process_info['is_running'] = process.is_running
+        record.status = process.status
+        record.is_running = process.is_running
     except Exception as e:
-        print(f"Error getting additional process info for PID {process.pid}: {e}")
+        logger.error(f"Error getting additional process info for PID {process.pid}: {e}")
     
-    processes.append(process_info)
+    return record
 
-# Output combined data
-result = {
-    'gpu_info': gpu_info,
-    'processes': processes
-}
-print(json.dumps(result))
-"""
+def collect_data():
+    """Collect all data about GPUs and processes"""
+    current_time = time.time()
+    
+    logger.debug("Collecting data about GPUs and processes...")
+    
+    # Most processes persist between refreshes: look up their containers
+    # on the pool while NVML is being queried
+    prefetched = {pid: _CT_POOL.submit(get_container_info, pid) for pid in list(_PID_CONTAINER_CACHE)}
     
-    output = run_nvitop_script(gpu_script)
-    if not output:
-        logger.error("Failed to get data from nvitop")
+    try:
+        nvitop_data = query_nvitop()
+    except Exception as e:
+        logger.error(f"Failed to get data from nvitop: {e}")
         return {'timestamp': current_time, 'error': 'Failed to get data from nvitop'}
     
     try:
-        nvitop_data = json.loads(output)
+        # Container lookups are independent file reads, only new processes are looked up now
+        processes = nvitop_data['processes']
+        pids = [process.pid for process in processes]
+        new_pids = [pid for pid in pids if pid not in prefetched]
+        new_infos = dict(zip(new_pids, _CT_POOL.map(get_container_info, new_pids)))
+        container_infos = [prefetched[pid].result() if pid in prefetched else new_infos[pid] for pid in pids]
         
-        # Add container information to processes
-        for process in nvitop_data['processes']:
-            container_info = get_container_info(process['pid'])
-            if container_info:
-                process['container_id'] = container_info['id']
-                process['container_name'] = container_info['name']
-            else:
-                process['container_id'] = None
-                process['container_name'] = None
-        
-        # Identify containers using multiple GPUs
-        containers = {}
+        # Single pass: annotate processes, track GPUs per container and group by container and GPU
+        container_gpus = {}
         container_names = {}
-        
-        for process in nvitop_data['processes']:
-            if process.get('container_id'):
-                container_id = process['container_id']
-                container_name = process.get('container_name', 'Unknown')
-                gpu_index = process['gpu_index']
-                
-                # Save container name
-                if container_id not in container_names:
-                    container_names[container_id] = container_name
-                
-                # Track GPU usage by this container
-                if container_id not in containers:
-                    containers[container_id] = set()
-                
-                containers[container_id].add(gpu_index)
-        
-        # Filter containers using multiple GPUs
-        multi_gpu_containers = {}
-        for container_id, gpu_indices in containers.items():
-            if len(gpu_indices) > 1:
-                multi_gpu_containers[container_id] = {
-                    'gpu_indices': list(gpu_indices),
-                    'name': container_names.get(container_id, 'Unknown')
-                }
-        
-        # Group processes by container and GPU
         container_processes = {}
-        for process in nvitop_data['processes']:
-            container_id = process.get('container_id') or 'Host'
-            container_name = process.get('container_name') or 'Host System'
-            gpu_index = process['gpu_index']
+        live_pids = set()
+        
+        for process, container_info in zip(processes, container_infos):
+            live_pids.add(process.pid)
+            gpu_index = process.gpu_index
             
-            key = f"{container_id}_{gpu_index}"
-            if key not in container_processes:
-                container_processes[key] = {
-                    'container_id': container_id,
-                    'container_name': container_name,
+            if container_info:
+                container_id = process.container_id = container_info['id']
+                container_name = process.container_name = container_info['name']
+                container_gpus.setdefault(container_id, set()).add(gpu_index)
+                container_names.setdefault(container_id, container_name)
+            
+            key = f"{process.container_id or 'Host'}_{gpu_index}"
+            group = container_processes.get(key)
+            if group is None:
+                group = container_processes[key] = {
+                    'container_id': process.container_id or 'Host',
+                    'container_name': process.container_name or 'Host System',
                     'gpu_index': gpu_index,
                     'process_count': 0,
                     'total_memory': 0,
                     'gpu_utilization': 0
                 }
             
-            container_processes[key]['process_count'] += 1
-            container_processes[key]['total_memory'] += process['gpu_memory']
+            group['process_count'] += 1
+            group['total_memory'] += process.gpu_memory
             
-            # Добавляем процент использования GPU, если доступен
-            if 'gpu_utilization' in process:
-                container_processes[key]['gpu_utilization'] += process.get('gpu_utilization', 0)
+            # Добавляем процент использования GPU, если доступен (NA is not a number and would turn the sum into nan)
+            if isinstance(process.gpu_utilization, (int, float)):
+                group['gpu_utilization'] += process.gpu_utilization
+        
+        # Forget processes that are no longer running (after prefetches of exited ones finish)
+        wait(prefetched.values())
+        for pid in list(_PID_CONTAINER_CACHE):
+            if pid not in live_pids:
+                del _PID_CONTAINER_CACHE[pid]
+        
+        # Containers using multiple GPUs
+        multi_gpu_containers = {
+            container_id: {
+                'gpu_indices': list(gpu_indices),
+                'name': container_names[container_id]
+            }
+            for container_id, gpu_indices in container_gpus.items()
+            if len(gpu_indices) > 1
+        }
         
         # Final data structure
         data = {
@@ -322,10 +482,6 @@ print(json.dumps(result))
             'container_processes': container_processes
         }
         
-        # Update cache
-        last_data = data
-        last_update_time = current_time
-        
         return data
     except Exception as e:
         logger.error(f"Error processing nvitop data: {e}")
@@ -333,262 +489,8 @@ print(json.dumps(result))
         logger.error(f"Traceback: {traceback.format_exc()}")
         return {'timestamp': current_time, 'error': str(e)}
 
-def generate_html(data):
-    """Generate HTML page with GPU and process data"""
-    try:
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['timestamp']))
-        
-        # Check for errors
-        if 'error' in data:
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>GPU Monitoring Error</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .error {{ color: red; font-weight: bold; }}
-                </style>
-            </head>
-            <body>
-                <h1>GPU Monitoring Error</h1>
-                <p>Last updated: {timestamp}</p>
-                <p class="error">Error: {data['error']}</p>
-                <button onclick="window.location.reload()">Refresh</button>
-            </body>
-            </html>
-            """
-        
-        # Prepare rows for GPU summary table
-        gpu_rows = ""
-        gpu_details = ""
-        
-        for gpu in data['gpu_info']:
-            # Преобразуем мощность из mW в W
-            power_usage_watts = gpu['power_usage'] / 1000
-            power_limit_watts = gpu['power_limit'] / 1000
-            # Рассчитываем процент использования мощности
-            power_percent = int((power_usage_watts / power_limit_watts) * 100) if power_limit_watts > 0 else 0
-            
-            # Получаем информацию о частотах, если доступна
-            clock_info = ""
-            if 'graphics_clock' in gpu and 'memory_clock' in gpu and 'sm_clock' in gpu:
-                clock_info = f"Graphics: {gpu['graphics_clock']} MHz<br>Memory: {gpu['memory_clock']} MHz<br>SM: {gpu['sm_clock']} MHz"
-            
-            # Цвета для индикаторов загрузки
-            memory_bar_color = "#4CAF50"  # Зеленый по умолчанию
-            power_bar_color = "#4CAF50"   # Зеленый по умолчанию
-            gpu_bar_color = "#4CAF50"     # Зеленый по умолчанию
-            
-            # Изменяем цвет на желтый для значений > 70%
-            if gpu['memory_percent'] > 70:
-                memory_bar_color = "#FFEB3B"
-            if power_percent > 70:
-                power_bar_color = "#FFEB3B"
-            if gpu['utilization'] > 70:
-                gpu_bar_color = "#FFEB3B"
-                
-            # Изменяем цвет на красный для значений > 90%
-            if gpu['memory_percent'] > 90:
-                memory_bar_color = "#F44336"
-            if power_percent > 90:
-                power_bar_color = "#F44336"
-            if gpu['utilization'] > 90:
-                gpu_bar_color = "#F44336"
-            
-            gpu_rows += f"""
-            <tr>
-                <td>{gpu['index']}</td>
-                <td>{gpu['name']}</td>
-                <td>
-                    <div>{gpu['utilization']}%</div>
-                    <div class="gpu-bar-container">
-                        <div class="gpu-bar" style="width:{gpu['utilization']}%; background-color:{gpu_bar_color}"></div>
-                    </div>
-                </td>
-                <td>
-                    <div>{gpu['memory_used_human']}/{gpu['memory_total_human']} ({gpu['memory_percent']}%)</div>
-                    <div class="gpu-bar-container">
-                        <div class="gpu-bar" style="width:{gpu['memory_percent']}%; background-color:{memory_bar_color}"></div>
-                    </div>
-                </td>
-                <td>
-                    <div>{power_usage_watts:.1f}W / {power_limit_watts:.1f}W ({power_percent}%)</div>
-                    <div class="gpu-bar-container">
-                        <div class="gpu-bar" style="width:{power_percent}%; background-color:{power_bar_color}"></div>
-                    </div>
-                </td>
-                <td>{gpu['temperature']}°C</td>
-                <td>
-                    PCIe TX (↑): {gpu.get('pcie_tx_human', 'N/A')}<br>
-                    PCIe RX (↓): {gpu.get('pcie_rx_human', 'N/A')}
-                    {f"<br>NVLink TX: {gpu.get('nvlink_tx_human', 'N/A')}<br>NVLink RX: {gpu.get('nvlink_rx_human', 'N/A')}" if 'nvlink_tx_human' in gpu and gpu.get('nvlink_tx_human') != '[]' else ''}
-                </td>
-                <td>{clock_info}</td>
-            </tr>
-            """
-            
-            # Подробная информация о GPU для аккордеона
-            pcie_info = ""
-            nvlink_info = ""
-            video_info = ""
-            driver_info = ""
-            
-            if 'pcie_tx_human' in gpu and 'pcie_rx_human' in gpu:
-                pcie_info = f"""<tr><td>PCIe Throughput</td><td>TX: {gpu.get('pcie_tx_human', 'N/A')}, RX: {gpu.get('pcie_rx_human', 'N/A')}</td></tr>"""
-            
-            if 'nvlink_tx_human' in gpu and 'nvlink_rx_human' in gpu:
-                nvlink_info = f"""<tr><td>NVLink Throughput</td><td>TX: {gpu.get('nvlink_tx_human', 'N/A')}, RX: {gpu.get('nvlink_rx_human', 'N/A')}</td></tr>"""
-            
-            if 'encoder_utilization' in gpu and 'decoder_utilization' in gpu:
-                video_info = f"""<tr><td>Video Encoder/Decoder</td><td>Encoder: {gpu.get('encoder_utilization', 'N/A')}%, Decoder: {gpu.get('decoder_utilization', 'N/A')}%</td></tr>"""
-            
-            if 'compute_mode' in gpu and 'driver_version' in gpu:
-                driver_info = f"""<tr><td>Driver Info</td><td>Version: {gpu.get('driver_version', 'N/A')}, Compute Mode: {gpu.get('compute_mode', 'N/A')}</td></tr>"""
-            
-            max_clocks = """"""
-            if 'max_graphics_clock' in gpu and 'max_memory_clock' in gpu and 'max_sm_clock' in gpu:
-                max_clocks = f"""<tr><td>Max Clocks</td><td>Graphics: {gpu.get('max_graphics_clock', 'N/A')} MHz, Memory: {gpu.get('max_memory_clock', 'N/A')} MHz, SM: {gpu.get('max_sm_clock', 'N/A')} MHz</td></tr>"""
-            
-            gpu_details += f"""
-            <div class="accordion-item">
-                <h3 class="accordion-header">GPU {gpu['index']}: {gpu['name']}</h3>
-                <div class="accordion-content">
-                    <table class="details-table">
-                        <tr><td>UUID</td><td>{gpu['uuid']}</td></tr>
-                        {pcie_info}
-                        {nvlink_info}
-                        {video_info}
-                        {max_clocks}
-                        {driver_info}
-                    </table>
-                </div>
-            </div>
-            """
-        
-        # Prepare rows for container table
-        container_rows = ""
-        for key, info in data['container_processes'].items():
-            container_id = info['container_id']
-            container_name = info['container_name']
-            gpu_index = info['gpu_index']
-            process_count = info['process_count']
-            total_memory = info['total_memory'] / (1024 * 1024)  # Bytes to MB
-            
-            # Check if container uses multiple GPUs
-            is_multi_gpu = container_id in data['multi_gpu_containers']
-            row_class = "multi-gpu" if is_multi_gpu else ""
-            
-            # Получаем информацию о проценте использования GPU
-            gpu_util = info.get('gpu_utilization', 0)
-            
-            # Выбираем цвет для индикатора загрузки
-            util_bar_color = "#4CAF50"  # Зеленый по умолчанию
-            
-            # Изменяем цвет на желтый или красный для высоких значений
-            if gpu_util > 70:
-                util_bar_color = "#FFEB3B"  # Желтый
-            if gpu_util > 90:
-                util_bar_color = "#F44336"  # Красный
-            
-            container_rows += f"""
-            <tr class="{row_class}">
-                <td>{container_id}</td>
-                <td>{container_name}</td>
-                <td>{gpu_index}</td>
-                <td>
-                    <div>{gpu_util:.1f}%</div>
-                    <div class="gpu-bar-container">
-                        <div class="gpu-bar" style="width:{gpu_util}%; background-color:{util_bar_color}"></div>
-                    </div>
-                </td>
-                <td>{process_count}</td>
-                <td>{total_memory:.2f} MiB</td>
-            </tr>
-            """
-        
-        # Prepare rows for multi-GPU containers table
-        multi_gpu_rows = ""
-        for container_id, container_info in data['multi_gpu_containers'].items():
-            gpu_indices = container_info['gpu_indices']
-            container_name = container_info['name']
-            multi_gpu_rows += f"""
-            <tr>
-                <td>{container_id}</td>
-                <td>{container_name}</td>
-                <td>{', '.join(map(str, gpu_indices))}</td>
-            </tr>
-            """
-        
-        # Prepare rows for process details table
-        process_rows = ""
-        for process in data['processes']:
-            container_id = process.get('container_id') or 'Host'
-            container_name = process.get('container_name') or 'Host System'
-            
-            # Check if process belongs to multi-GPU container
-            is_multi_gpu = container_id in data['multi_gpu_containers']
-            row_class = "multi-gpu" if is_multi_gpu else ""
-            
-            # GPU memory
-            memory_mb = process['gpu_memory'] / (1024 * 1024)
-            
-            # GPU utilization 
-            gpu_util = process.get('gpu_utilization', 'N/A')
-            if gpu_util != 'N/A':
-                gpu_util = f"{gpu_util}%"
-            
-            # Host memory
-            host_memory = process.get('host_memory_human', 'N/A')
-            host_memory_percent = process.get('host_memory_percent', 'N/A')
-            if host_memory != 'N/A' and host_memory_percent != 'N/A':
-                host_memory = f"{host_memory} ({host_memory_percent}%)"
-            
-            # CPU usage
-            cpu_percent = process.get('cpu_percent', 'N/A')
-            if cpu_percent != 'N/A':
-                cpu_percent = f"{cpu_percent:.1f}%"
-            
-            # Running time
-            running_time = process.get('running_time_human', 'N/A')
-            
-            # Status
-            status = process.get('status', 'N/A')
-            
-            # Удаляем процент использования хост-памяти
-            if host_memory != 'N/A' and isinstance(host_memory, str) and '(' in host_memory:
-                # Выбираем только размер памяти без процента
-                host_memory = host_memory.split('(')[0].strip()
-            
-            process_rows += f"""
-            <tr class="{row_class}">
-                <td>{container_id}</td>
-                <td>{container_name}</td>
-                <td>{process['pid']}</td>
-                <td>{process['command']}</td>
-                <td>{process['gpu_index']}</td>
-                <td>{gpu_util}</td>
-                <td>{cpu_percent}</td>
-                <td>{memory_mb:.2f} MiB</td>
-                <td>{host_memory}</td>
-                <td>{running_time}</td>
-            </tr>
-            """
-        
-        # Заполняем переменные в шаблоне
-        template_vars = {
-            'timestamp': timestamp,
-            'gpu_rows': gpu_rows,
-            'gpu_details': gpu_details,
-            'container_rows': container_rows,
-            'multi_gpu_rows': multi_gpu_rows,
-            'process_rows': process_rows
-        }
-        
-        # Complete HTML template
-        html = f"""
+# Static HTML page parts, encoded once at import: head with CSS/JS, table headers and tail
+_HTML_HEAD = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -596,61 +498,61 @@ def generate_html(data):
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>GPU and LXC Container Monitoring</title>
             <style>
-                body {{
+                body {
                     font-family: Arial, sans-serif;
                     margin: 20px;
                     background-color: #f5f5f5;
-                }}
-                h1 {{
+                }
+                h1 {
                     color: #333;
                     border-bottom: 2px solid #ccc;
                     padding-bottom: 10px;
-                }}
-                table {{
+                }
+                table {
                     width: 100%;
                     border-collapse: collapse;
                     margin-bottom: 20px;
                     background-color: white;
-                }}
-                th, td {{
+                }
+                th, td {
                     padding: 8px;
                     text-align: left;
                     border: 1px solid #ddd;
-                }}
-                th {{
+                }
+                th {
                     background-color: #f2f2f2;
                     font-weight: bold;
-                }}
-                tr:nth-child(even) {{
+                }
+                tbody tr:nth-child(odd) {
                     background-color: #f9f9f9;
-                }}
-                .container {{
+                }
+                .container {
                     margin-bottom: 30px;
-                }}
-                .timestamp {{
+                }
+                .timestamp {
                     color: #666;
                     font-style: italic;
                     margin-bottom: 10px;
-                }}
-                .gpu-bar {{
+                }
+                .gpu-bar {
                     height: 20px;
                     background-color: #4CAF50;
                     text-align: center;
                     color: black;
                     font-weight: bold;
                     border-radius: 3px;
-                }}
-                .gpu-bar-container {{
+                }
+                .gpu-bar-container {
                     width: 100%;
                     background-color: #f1f1f1;
                     border-radius: 3px;
-                }}
-                .refresh-controls {{
+                }
+                .refresh-controls {
                     display: flex;
                     align-items: center;
                     margin-bottom: 20px;
-                }}
-                .refresh-button {{
+                }
+                .refresh-button {
                     background-color: #4CAF50;
                     color: white;
                     padding: 10px 15px;
@@ -659,40 +561,40 @@ def generate_html(data):
                     cursor: pointer;
                     font-size: 16px;
                     margin-right: 15px;
-                }}
-                .refresh-button:hover {{
+                }
+                .refresh-button:hover {
                     background-color: #45a049;
-                }}
-                .auto-refresh-label {{
+                }
+                .auto-refresh-label {
                     display: flex;
                     align-items: center;
                     font-size: 14px;
                     cursor: pointer;
-                }}
-                .auto-refresh-label input {{
+                }
+                .auto-refresh-label input {
                     margin-right: 5px;
                     width: 18px;
                     height: 18px;
-                }}
-                .multi-gpu {{
+                }
+                .multi-gpu {
                     background-color: #ffeeba;
-                }}
-                .multi-gpu td {{
+                }
+                .multi-gpu td {
                     border: 1px solid #ffeeba;
-                }}
+                }
                 
                 /* Accordion Styles */
-                .accordion {{
+                .accordion {
                     width: 100%;
                     margin-bottom: 20px;
-                }}
-                .accordion-item {{
+                }
+                .accordion-item {
                     margin-bottom: 5px;
                     border: 1px solid #ddd;
                     border-radius: 4px;
                     overflow: hidden;
-                }}
-                .accordion-header {{
+                }
+                .accordion-header {
                     background-color: #f2f2f2;
                     padding: 10px 15px;
                     cursor: pointer;
@@ -700,104 +602,271 @@ def generate_html(data):
                     font-size: 16px;
                     font-weight: bold;
                     position: relative;
-                }}
-                .accordion-header::after {{
+                }
+                .accordion-header::after {
                     content: '+';
                     position: absolute;
                     right: 15px;
                     top: 10px;
-                }}
-                .accordion-header.active::after {{
+                }
+                .accordion-header.active::after {
                     content: '-';
-                }}
-                .accordion-content {{
+                }
+                .accordion-content {
                     padding: 0;
                     max-height: 0;
                     overflow: hidden;
                     transition: max-height 0.3s ease-out;
-                }}
-                .details-table {{
+                }
+                .details-table {
                     width: 100%;
                     border-collapse: collapse;
-                }}
-                .details-table td {{
+                }
+                .details-table td {
                     padding: 8px 15px;
                     border: 1px solid #ddd;
-                }}
-                .details-table td:first-child {{
+                }
+                .details-table td:first-child {
                     width: 30%;
                     font-weight: bold;
                     background-color: #f9f9f9;
-                }}
+                }
             </style>
             <script>
-                document.addEventListener('DOMContentLoaded', function() {{
+                // Table rendering from /api/data.json, mirrors the server-side rendering
+                function escapeHtml(value) {
+                    return String(value).replace(/[&<>"]/g, function(c) {
+                        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c];
+                    });
+                }
+                
+                function barColor(percent) {
+                    return percent > 90 ? '#F44336' : percent > 70 ? '#FFEB3B' : '#4CAF50';
+                }
+                
+                function barCell(text, percent, color) {
+                    return '<td><div>' + text + '</div><div class="gpu-bar-container">' +
+                        '<div class="gpu-bar" style="width:' + percent + '%; background-color:' + color + '"></div>' +
+                        '</div></td>';
+                }
+                
+                function formatThroughput(value) {
+                    return Array.isArray(value) ? value.join(', ') : value;
+                }
+                
+                function gpuRow(gpu) {
+                    var powerUsage = gpu.power_usage / 1000;
+                    var powerLimit = gpu.power_limit / 1000;
+                    var powerPercent = powerLimit > 0 ? Math.floor(powerUsage / powerLimit * 100) : 0;
+                    var throughput = 'PCIe TX (↑): ' + escapeHtml(gpu.pcie_tx_human || 'N/A') +
+                        '<br>PCIe RX (↓): ' + escapeHtml(gpu.pcie_rx_human || 'N/A');
+                    var nvlink = gpu.nvlink_tx_human;
+                    if (nvlink && nvlink.length && nvlink !== '[]') {
+                        throughput += '<br>NVLink TX: ' + escapeHtml(formatThroughput(nvlink)) +
+                            '<br>NVLink RX: ' + escapeHtml(formatThroughput(gpu.nvlink_rx_human || 'N/A'));
+                    }
+                    var clockInfo = '';
+                    if (gpu.graphics_clock != null && gpu.memory_clock != null && gpu.sm_clock != null) {
+                        clockInfo = 'Graphics: ' + gpu.graphics_clock + ' MHz<br>Memory: ' + gpu.memory_clock +
+                            ' MHz<br>SM: ' + gpu.sm_clock + ' MHz';
+                    }
+                    return '<tr><td>' + gpu.index + '</td><td>' + escapeHtml(gpu.name) + '</td>' +
+                        barCell(gpu.utilization + '%', gpu.utilization, barColor(gpu.utilization)) +
+                        barCell(escapeHtml(gpu.memory_used_human) + '/' + escapeHtml(gpu.memory_total_human) +
+                            ' (' + gpu.memory_percent + '%)', gpu.memory_percent, barColor(gpu.memory_percent)) +
+                        barCell(powerUsage.toFixed(1) + 'W / ' + powerLimit.toFixed(1) + 'W (' + powerPercent + '%)',
+                            powerPercent, barColor(powerPercent)) +
+                        '<td>' + gpu.temperature + '°C</td><td>' + throughput + '</td><td>' + clockInfo + '</td></tr>';
+                }
+                
+                function containerRow(info, multiGpuContainers) {
+                    var gpuUtil = info.gpu_utilization || 0;
+                    var rowClass = info.container_id in multiGpuContainers ? 'multi-gpu' : '';
+                    return '<tr class="' + rowClass + '"><td>' + escapeHtml(info.container_id) + '</td>' +
+                        '<td>' + escapeHtml(info.container_name) + '</td><td>' + info.gpu_index + '</td>' +
+                        barCell(gpuUtil.toFixed(1) + '%', gpuUtil, barColor(gpuUtil)) +
+                        '<td>' + info.process_count + '</td>' +
+                        '<td>' + (info.total_memory / (1024 * 1024)).toFixed(2) + ' MiB</td></tr>';
+                }
+                
+                function multiGpuRow(containerId, info) {
+                    return '<tr><td>' + escapeHtml(containerId) + '</td><td>' + escapeHtml(info.name) + '</td>' +
+                        '<td>' + info.gpu_indices.join(', ') + '</td></tr>';
+                }
+                
+                function processRow(process, multiGpuContainers) {
+                    var containerId = process.container_id || 'Host';
+                    var rowClass = containerId in multiGpuContainers ? 'multi-gpu' : '';
+                    var gpuUtil = process.gpu_utilization != null ? process.gpu_utilization + '%' : 'N/A';
+                    var cpuPercent = typeof process.cpu_percent === 'number' ? process.cpu_percent.toFixed(1) + '%' : 'N/A';
+                    return '<tr class="' + rowClass + '"><td>' + escapeHtml(containerId) + '</td>' +
+                        '<td>' + escapeHtml(process.container_name || 'Host System') + '</td>' +
+                        '<td>' + process.pid + '</td><td>' + escapeHtml(process.command) + '</td>' +
+                        '<td>' + process.gpu_index + '</td><td>' + gpuUtil + '</td><td>' + cpuPercent + '</td>' +
+                        '<td>' + (process.gpu_memory / (1024 * 1024)).toFixed(2) + ' MiB</td>' +
+                        '<td>' + escapeHtml(process.host_memory_human || 'N/A') + '</td>' +
+                        '<td>' + escapeHtml(process.running_time_human || 'N/A') + '</td></tr>';
+                }
+                
+                function formatTimestamp(timestamp) {
+                    var date = new Date(timestamp * 1000);
+                    function pad(n) { return (n < 10 ? '0' : '') + n; }
+                    return date.getFullYear() + '-' + pad(date.getMonth() + 1) + '-' + pad(date.getDate()) + ' ' +
+                        pad(date.getHours()) + ':' + pad(date.getMinutes()) + ':' + pad(date.getSeconds());
+                }
+                
+                var lastTimestamp = null;
+                
+                function renderData(data) {
+                    // Errors are rendered by the server as a separate page
+                    if (data.error) {
+                        window.location.reload();
+                        return;
+                    }
+                    if (data.timestamp === lastTimestamp) {
+                        return;
+                    }
+                    lastTimestamp = data.timestamp;
+                    var multi = data.multi_gpu_containers;
+                    document.getElementById('last-updated').textContent = formatTimestamp(data.timestamp);
+                    document.getElementById('gpu-rows').innerHTML = data.gpu_info.map(gpuRow).join('');
+                    document.getElementById('container-rows').innerHTML = Object.keys(data.container_processes)
+                        .map(function(key) { return containerRow(data.container_processes[key], multi); }).join('');
+                    document.getElementById('multi-gpu-rows').innerHTML = Object.keys(multi)
+                        .map(function(id) { return multiGpuRow(id, multi[id]); }).join('');
+                    document.getElementById('process-rows').innerHTML = data.processes
+                        .map(function(process) { return processRow(process, multi); }).join('');
+                }
+                
+                var pendingData = null;
+                
+                function scheduleRender(data) {
+                    // Rebuild the tables when the browser is idle; only the latest snapshot is rendered
+                    if (!window.requestIdleCallback) {
+                        renderData(data);
+                        return;
+                    }
+                    var scheduled = pendingData !== null;
+                    pendingData = data;
+                    if (!scheduled) {
+                        requestIdleCallback(function() {
+                            var latest = pendingData;
+                            pendingData = null;
+                            renderData(latest);
+                        }, {timeout: 1000});
+                    }
+                }
+                
+                function refreshData() {
+                    // 'no-cache' revalidates with the ETag, unchanged data comes back as 304
+                    fetch('/api/data.json', {cache: 'no-cache'})
+                        .then(function(response) { return response.json(); })
+                        .then(scheduleRender)
+                        .catch(function(error) { console.error('Failed to refresh data:', error); });
+                }
+                
+                document.addEventListener('DOMContentLoaded', function() {
                     // Accordion functionality
                     var headers = document.querySelectorAll('.accordion-header');
-                    headers.forEach(function(header) {{
-                        header.addEventListener('click', function() {{
+                    headers.forEach(function(header) {
+                        header.addEventListener('click', function() {
                             this.classList.toggle('active');
                             var content = this.nextElementSibling;
-                            if (content.style.maxHeight) {{
+                            if (content.style.maxHeight) {
                                 content.style.maxHeight = null;
-                            }} else {{
+                            } else {
                                 content.style.maxHeight = content.scrollHeight + 'px';
-                            }}
-                        }});
-                    }});
+                            }
+                        });
+                    });
                     
                     // Auto-refresh functionality
                     var autoRefreshCheckbox = document.getElementById('auto-refresh');
                     var refreshTimerId = null;
+                    var eventSource = null;
                     
                     // Load saved preference from localStorage
-                    if (localStorage.getItem('gpu_monitor_autorefresh') === 'true') {{
+                    if (localStorage.getItem('gpu_monitor_autorefresh') === 'true') {
                         autoRefreshCheckbox.checked = true;
                         startAutoRefresh();
-                    }}
+                    }
                     
-                    autoRefreshCheckbox.addEventListener('change', function() {{
-                        if (this.checked) {{
+                    autoRefreshCheckbox.addEventListener('change', function() {
+                        if (this.checked) {
                             localStorage.setItem('gpu_monitor_autorefresh', 'true');
                             startAutoRefresh();
-                        }} else {{
+                        } else {
                             localStorage.setItem('gpu_monitor_autorefresh', 'false');
                             stopAutoRefresh();
-                        }}
-                    }});
+                        }
+                    });
                     
-                    function startAutoRefresh() {{
-                        if (refreshTimerId) {{
-                            clearInterval(refreshTimerId);
-                        }}
-                        refreshTimerId = setInterval(function() {{
-                            window.location.reload();
-                        }}, 5000); // Refresh every 5 seconds
-                    }}
+                    function startAutoRefresh() {
+                        stopAutoRefresh();
+                        // The server pushes every new snapshot as a Server-Sent Event;
+                        // poll instead if the browser has no EventSource or the server refuses the stream
+                        if (!window.EventSource) {
+                            startPolling();
+                            return;
+                        }
+                        var source = new EventSource('/events');
+                        source.onmessage = function(event) {
+                            scheduleRender(JSON.parse(event.data));
+                        };
+                        source.onerror = function() {
+                            if (source.readyState === EventSource.CLOSED && eventSource === source) {
+                                eventSource = null;
+                                startPolling();
+                            }
+                        };
+                        eventSource = source;
+                    }
+                    
+                    function startPolling() {
+                        refreshTimerId = setInterval(refreshData, 5000); // Refresh every 5 seconds
+                    }
                     
-                    function stopAutoRefresh() {{
-                        if (refreshTimerId) {{
+                    // No updates while the tab is hidden; the stream sends the current data when it reopens
+                    document.addEventListener('visibilitychange', function() {
+                        if (!autoRefreshCheckbox.checked) {
+                            return;
+                        }
+                        if (document.visibilityState === 'visible') {
+                            startAutoRefresh();
+                        } else {
+                            stopAutoRefresh();
+                        }
+                    });
+                    
+                    function stopAutoRefresh() {
+                        if (eventSource) {
+                            eventSource.close();
+                            eventSource = null;
+                        }
+                        if (refreshTimerId) {
                             clearInterval(refreshTimerId);
                             refreshTimerId = null;
-                        }}
-                    }}
-                }});
+                        }
+                    }
+                });
             </script>
         </head>
         <body>
             <h1>GPU and LXC Container Monitoring</h1>
-            <div class="timestamp">Last updated: {timestamp}</div>
+            <div class="timestamp">Last updated: <span id="last-updated">""".encode('utf-8')
+
+_HTML_GPU_TABLE = """</span></div>
             <div class="refresh-controls">
-                <button class="refresh-button" onclick="window.location.reload()">Refresh Data</button>
+                <button class="refresh-button" onclick="refreshData()">Refresh Data</button>
                 <label class="auto-refresh-label">
-                    <input type="checkbox" id="auto-refresh" /> Auto-refresh (5s)
+                    <input type="checkbox" id="auto-refresh" /> Auto-refresh
                 </label>
             </div>
             
             <div class="container">
                 <h2>GPU Summary</h2>
                 <table>
-                    <tr>
+                    <thead><tr>
                         <th>GPU Index</th>
                         <th>GPU Name</th>
                         <th>GPU Usage (%)</th>
@@ -806,8 +875,12 @@ def generate_html(data):
                         <th>Temperature</th>
                         <th>Throughput</th>
                         <th>Clock Speeds</th>
-                    </tr>
-                    {gpu_rows}
+                    </tr></thead>
+                    <tbody id="gpu-rows">
+                    """.encode('utf-8')
+
+_HTML_CONTAINER_TABLE = """
+                    </tbody>
                 </table>
             </div>
             
@@ -816,34 +889,42 @@ def generate_html(data):
             <div class="container">
                 <h2>Containers</h2>
                 <table>
-                    <tr>
+                    <thead><tr>
                         <th>Container ID</th>
                         <th>Container Name</th>
                         <th>GPU Index</th>
                         <th>GPU %</th>
                         <th>Processes</th>
                         <th>GPU Memory Used (MiB)</th>
-                    </tr>
-                    {container_rows}
+                    </tr></thead>
+                    <tbody id="container-rows">
+                    """.encode('utf-8')
+
+_HTML_MULTI_GPU_TABLE = """
+                    </tbody>
                 </table>
             </div>
             
             <div class="container">
                 <h2>Containers Using Multiple GPUs</h2>
                 <table>
-                    <tr>
+                    <thead><tr>
                         <th>Container ID</th>
                         <th>Container Name</th>
                         <th>GPU Indices</th>
-                    </tr>
-                    {multi_gpu_rows}
+                    </tr></thead>
+                    <tbody id="multi-gpu-rows">
+                    """.encode('utf-8')
+
+_HTML_PROCESS_TABLE = """
+                    </tbody>
                 </table>
             </div>
             
             <div class="container">
                 <h2>Process Details</h2>
                 <table>
-                    <tr>
+                    <thead><tr>
                         <th>Container ID</th>
                         <th>Container Name</th>
                         <th>PID</th>
@@ -854,198 +935,904 @@ def generate_html(data):
                         <th>GPU Memory</th>
                         <th>Host Memory</th>
                         <th>Running Time</th>
-                    </tr>
-                    {process_rows}
+                    </tr></thead>
+                    <tbody id="process-rows">
+                    """.encode('utf-8')
+
+_HTML_TAIL = """
+                    </tbody>
                 </table>
             </div>
         </body>
         </html>
-        """
+        """.encode('utf-8')
+
+# Table row templates, %-formatted per row
+_GPU_ROW_TMPL = """
+            <tr>
+                <td>%s</td>
+                <td>%s</td>
+                <td>
+                    <div>%s%%</div>
+                    <div class="gpu-bar-container">
+                        <div class="gpu-bar" style="width:%s%%; background-color:%s"></div>
+                    </div>
+                </td>
+                <td>
+                    <div>%s/%s (%s%%)</div>
+                    <div class="gpu-bar-container">
+                        <div class="gpu-bar" style="width:%s%%; background-color:%s"></div>
+                    </div>
+                </td>
+                <td>
+                    <div>%.1fW / %.1fW (%d%%)</div>
+                    <div class="gpu-bar-container">
+                        <div class="gpu-bar" style="width:%d%%; background-color:%s"></div>
+                    </div>
+                </td>
+                <td>%s°C</td>
+                <td>
+                    PCIe TX (↑): %s<br>
+                    PCIe RX (↓): %s
+                    %s
+                </td>
+                <td>%s</td>
+            </tr>
+            """
+
+_CLOCK_INFO_TMPL = "Graphics: %s MHz<br>Memory: %s MHz<br>SM: %s MHz"
+
+_NVLINK_INFO_TMPL = "<br>NVLink TX: %s<br>NVLink RX: %s"
+
+_CONTAINER_ROW_TMPL = """
+            <tr class="%s">
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>
+                    <div>%.1f%%</div>
+                    <div class="gpu-bar-container">
+                        <div class="gpu-bar" style="width:%s%%; background-color:%s"></div>
+                    </div>
+                </td>
+                <td>%s</td>
+                <td>%.2f MiB</td>
+            </tr>
+            """
+
+_MULTI_GPU_ROW_TMPL = """
+            <tr>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+            </tr>
+            """
+
+_PROCESS_ROW_TMPL = """
+            <tr class="%s">
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%s</td>
+                <td>%.2f MiB</td>
+                <td>%s</td>
+                <td>%s</td>
+            </tr>
+            """
+
+# Text from containers and processes (names, command lines) is escaped with str.translate in one pass
+_HTML_ESCAPE_TABLE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+def bar_color(percent):
+    """Usage bar color: green, yellow above 70%, red above 90%"""
+    return '#F44336' if percent > 90 else '#FFEB3B' if percent > 70 else '#4CAF50'
+
+def gpu_row(gpu):
+    """GPU summary table row"""
+    # Преобразуем мощность из mW в W
+    power_usage_watts = gpu['power_usage'] / 1000
+    power_limit_watts = gpu['power_limit'] / 1000
+    # Рассчитываем процент использования мощности
+    power_percent = int((power_usage_watts / power_limit_watts) * 100) if power_limit_watts > 0 else 0
+    
+    # Получаем информацию о частотах, если доступна
+    clock_info = ""
+    if 'graphics_clock' in gpu and 'memory_clock' in gpu and 'sm_clock' in gpu:
+        clock_info = _CLOCK_INFO_TMPL % (gpu['graphics_clock'], gpu['memory_clock'], gpu['sm_clock'])
+    
+    # NVLink пропускная способность по линкам, если они есть
+    nvlink_info = ""
+    if gpu.get('nvlink_tx_human') not in (None, [], '[]'):
+        nvlink_info = _NVLINK_INFO_TMPL % (', '.join(gpu['nvlink_tx_human']), ', '.join(gpu['nvlink_rx_human']))
+    
+    return _GPU_ROW_TMPL % (
+        gpu['index'], gpu['name'].translate(_HTML_ESCAPE_TABLE),
+        gpu['utilization'], gpu['utilization'], bar_color(gpu['utilization']),
+        gpu['memory_used_human'], gpu['memory_total_human'], gpu['memory_percent'],
+        gpu['memory_percent'], bar_color(gpu['memory_percent']),
+        power_usage_watts, power_limit_watts, power_percent, power_percent, bar_color(power_percent),
+        gpu['temperature'],
+        gpu.get('pcie_tx_human', 'N/A'), gpu.get('pcie_rx_human', 'N/A'), nvlink_info,
+        clock_info
+    )
+
+def container_row(info, multi_gpu_containers):
+    """Container table row for one container/GPU pair"""
+    container_id = info['container_id']
+    
+    # Check if container uses multiple GPUs
+    row_class = "multi-gpu" if container_id in multi_gpu_containers else ""
+    
+    # Процент использования GPU
+    gpu_util = info.get('gpu_utilization', 0)
+    
+    return _CONTAINER_ROW_TMPL % (
+        row_class, container_id.translate(_HTML_ESCAPE_TABLE), str(info['container_name']).translate(_HTML_ESCAPE_TABLE), info['gpu_index'],
+        gpu_util, gpu_util, bar_color(gpu_util),
+        info['process_count'], info['total_memory'] / (1024 * 1024)  # Bytes to MiB
+    )
+
+def multi_gpu_row(container_id, container_info):
+    """Multi-GPU containers table row"""
+    return _MULTI_GPU_ROW_TMPL % (
+        container_id.translate(_HTML_ESCAPE_TABLE), str(container_info['name']).translate(_HTML_ESCAPE_TABLE),
+        ', '.join(map(str, container_info['gpu_indices']))
+    )
+
+def process_row(process, multi_gpu_containers):
+    """Process details table row"""
+    container_id = process.container_id or 'Host'
+    
+    # Check if process belongs to multi-GPU container
+    row_class = "multi-gpu" if container_id in multi_gpu_containers else ""
+    
+    # GPU utilization 
+    gpu_util = process.gpu_utilization
+    if gpu_util in (None, 'N/A'):
+        gpu_util = 'N/A'
+    else:
+        gpu_util = f"{gpu_util}%"
+    
+    # CPU usage
+    cpu_percent = process.cpu_percent
+    if cpu_percent in (None, 'N/A'):
+        cpu_percent = 'N/A'
+    else:
+        cpu_percent = f"{cpu_percent:.1f}%"
+    
+    return _PROCESS_ROW_TMPL % (
+        row_class, container_id.translate(_HTML_ESCAPE_TABLE),
+        (process.container_name or 'Host System').translate(_HTML_ESCAPE_TABLE),
+        process.pid, process.command.translate(_HTML_ESCAPE_TABLE), process.gpu_index,
+        gpu_util, cpu_percent,
+        process.gpu_memory / (1024 * 1024),  # Bytes to MiB
+        process.host_memory_human or 'N/A',
+        process.running_time_human or 'N/A'
+    )
+
+def generate_html(data):
+    """Generate HTML page with GPU and process data as encoded bytes"""
+    try:
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['timestamp']))
+        
+        # Check for errors
+        if 'error' in data:
+            return f"""
+            <!DOCTYPE html>
+            <html>
+            <head>
+                <meta charset="UTF-8">
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <title>GPU Monitoring Error</title>
+                <style>
+                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
+                    .error {{ color: red; font-weight: bold; }}
+                </style>
+            </head>
+            <body>
+                <h1>GPU Monitoring Error</h1>
+                <p>Last updated: {timestamp}</p>
+                <p class="error">Error: {str(data['error']).translate(_HTML_ESCAPE_TABLE)}</p>
+                <button onclick="window.location.reload()">Refresh</button>
+            </body>
+            </html>
+            """.encode('utf-8')
+        
+        # Rows of each table are built in one join, without growing a string per row
+        multi_gpu_containers = data['multi_gpu_containers']
+        gpu_rows = ''.join([gpu_row(gpu) for gpu in data['gpu_info']])
+        container_rows = ''.join([container_row(info, multi_gpu_containers) for info in data['container_processes'].values()])
+        multi_gpu_rows = ''.join([multi_gpu_row(container_id, info) for container_id, info in multi_gpu_containers.items()])
+        process_rows = ''.join([process_row(process, multi_gpu_containers) for process in data['processes']])
         
-        return html
     except Exception as e:
         logger.error(f"Error generating HTML: {e}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>"
+        return f"<html><body><h1>Error</h1><p>{str(e).translate(_HTML_ESCAPE_TABLE)}</p></body></html>".encode('utf-8')
+    
+    # Complete HTML page: constant parts are joined as is, only rows are formatted and encoded
+    return b''.join([
+        _HTML_HEAD,
+        timestamp.encode('utf-8'),
+        _HTML_GPU_TABLE,
+        gpu_rows.encode('utf-8'),
+        _HTML_CONTAINER_TABLE,
+        container_rows.encode('utf-8'),
+        _HTML_MULTI_GPU_TABLE,
+        multi_gpu_rows.encode('utf-8'),
+        _HTML_PROCESS_TABLE,
+        process_rows.encode('utf-8'),
+        _HTML_TAIL,
+    ])
+
+# Prometheus metric families in output order: name -> HELP text
+_METRIC_HELP = {
+    'gpu_utilization': 'GPU utilization percentage',
+    'gpu_memory_used': 'GPU memory used in bytes',
+    'gpu_memory_total': 'GPU total memory in bytes',
+    'gpu_temperature': 'GPU temperature in Celsius',
+    'gpu_power_usage': 'GPU power usage in Watts',
+    'gpu_power_limit': 'GPU power limit in Watts',
+    'gpu_graphics_clock': 'GPU graphics clock in MHz',
+    'gpu_memory_clock': 'GPU memory clock in MHz',
+    'gpu_sm_clock': 'GPU SM clock in MHz',
+    'gpu_pcie_tx': 'PCIe TX throughput in bytes per second',
+    'gpu_pcie_rx': 'PCIe RX throughput in bytes per second',
+    'gpu_nvlink_tx': 'NVLink TX throughput in bytes per second',
+    'gpu_nvlink_rx': 'NVLink RX throughput in bytes per second',
+    'gpu_process_memory': 'GPU memory used by a process in bytes',
+    'process_cpu_percent': 'CPU usage percentage by a process',
+    'process_host_memory': 'Host memory used by a process in bytes',
+    'process_running_time': 'Process running time in seconds',
+    'process_gpu_utilization': 'GPU utilization percentage by a process',
+    'container_gpu_count': 'Number of GPUs used by a container'
+}
+
+# Per-process metric families and the ProcessRecord field each one reports
+_PROCESS_METRICS = (
+    ('gpu_process_memory', 'gpu_memory'),
+    ('process_cpu_percent', 'cpu_percent'),
+    ('process_host_memory', 'host_memory'),
+    ('process_running_time', 'running_time'),
+    ('process_gpu_utilization', 'gpu_utilization')
+)
+
+# HELP/TYPE header of each family, encoded once at import
+_METRIC_HEADERS = {
+    name: f'# HELP {name} {help_text}\n# TYPE {name} gauge\n'.encode('utf-8')
+    for name, help_text in _METRIC_HELP.items()
+}
+
+def safe_numeric(value, default=0, _float=float):
+    """Convert a metric value to float; None, '' and NaN become the default (float(NA) is NaN)"""
+    try:
+        value = _float(value)
+    except (ValueError, TypeError):
+        return default
+    # NaN is the only value not equal to itself
+    return value if value == value else default
+
+# Label value escaping per the exposition format: backslash, double quote and newline
+_LABEL_ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+def format_number(value):
+    """Format a sample value: integral values without '.0', others in shortest round-trip form"""
+    if not value:
+        return b'0'
+    if value.is_integer():
+        return b'%d' % value
+    return repr(value).encode()
 
 def generate_prometheus_metrics(data):
-    """Generate Prometheus-format metrics"""
-    metrics = []
-    
+    """Generate Prometheus-format metrics as encoded bytes"""
     # Check for errors
     if 'error' in data:
-        metrics.append(f'# HELP gpu_monitor_error Error status of GPU monitor')
-        metrics.append(f'# TYPE gpu_monitor_error gauge')
-        metrics.append(f'gpu_monitor_error 1')
-        return '\n'.join(metrics)
-    
-    # Helper function to ensure numeric values
-    def safe_numeric(value, default=0):
-        if value is None or value == "":
-            return default
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return default
+        return b'# HELP gpu_monitor_error Error status of GPU monitor\n# TYPE gpu_monitor_error gauge\ngpu_monitor_error 1\n'
+    
+    # Samples are collected per metric family, so each HELP/TYPE header is written once.
+    # Constant parts are bytes literals, only the label and sample values are formatted
+    families = {name: bytearray() for name in _METRIC_HEADERS}
     
     # GPU metrics
     for gpu in data['gpu_info']:
-        gpu_index = gpu['index']
-        
-        metrics.append(f'# HELP gpu_utilization GPU utilization percentage')
-        metrics.append(f'# TYPE gpu_utilization gauge')
-        metrics.append(f'gpu_utilization{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("utilization", 0))}')
+        gpu_label = str(gpu['index']).encode()
         
-        metrics.append(f'# HELP gpu_memory_used GPU memory used in bytes')
-        metrics.append(f'# TYPE gpu_memory_used gauge')
-        metrics.append(f'gpu_memory_used{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("memory_used", 0))}')
-        
-        metrics.append(f'# HELP gpu_memory_total GPU total memory in bytes')
-        metrics.append(f'# TYPE gpu_memory_total gauge')
-        metrics.append(f'gpu_memory_total{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("memory_total", 0))}')
-        
-        metrics.append(f'# HELP gpu_temperature GPU temperature in Celsius')
-        metrics.append(f'# TYPE gpu_temperature gauge')
-        metrics.append(f'gpu_temperature{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("temperature", 0))}')
+        families['gpu_utilization'] += b'gpu_utilization{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("utilization", 0))))
+        families['gpu_memory_used'] += b'gpu_memory_used{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("memory_used", 0))))
+        families['gpu_memory_total'] += b'gpu_memory_total{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("memory_total", 0))))
+        families['gpu_temperature'] += b'gpu_temperature{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("temperature", 0))))
         
         # Преобразуем мощность из mW в W
         power_watts = safe_numeric(gpu.get("power_usage", 0)) / 1000
         power_limit_watts = safe_numeric(gpu.get("power_limit", 0)) / 1000
         
-        metrics.append(f'# HELP gpu_power_usage GPU power usage in Watts')
-        metrics.append(f'# TYPE gpu_power_usage gauge')
-        metrics.append(f'gpu_power_usage{{gpu="{gpu_index}"}} {power_watts}')
-        
-        metrics.append(f'# HELP gpu_power_limit GPU power limit in Watts')
-        metrics.append(f'# TYPE gpu_power_limit gauge')
-        metrics.append(f'gpu_power_limit{{gpu="{gpu_index}"}} {power_limit_watts}')
+        families['gpu_power_usage'] += b'gpu_power_usage{gpu="%s"} %s\n' % (gpu_label, format_number(power_watts))
+        families['gpu_power_limit'] += b'gpu_power_limit{gpu="%s"} %s\n' % (gpu_label, format_number(power_limit_watts))
         
         # Частоты GPU
         if 'graphics_clock' in gpu:
-            metrics.append(f'# HELP gpu_graphics_clock GPU graphics clock in MHz')
-            metrics.append(f'# TYPE gpu_graphics_clock gauge')
-            metrics.append(f'gpu_graphics_clock{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("graphics_clock", 0))}')
-        
+            families['gpu_graphics_clock'] += b'gpu_graphics_clock{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("graphics_clock", 0))))
         if 'memory_clock' in gpu:
-            metrics.append(f'# HELP gpu_memory_clock GPU memory clock in MHz')
-            metrics.append(f'# TYPE gpu_memory_clock gauge')
-            metrics.append(f'gpu_memory_clock{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("memory_clock", 0))}')
-        
+            families['gpu_memory_clock'] += b'gpu_memory_clock{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("memory_clock", 0))))
         if 'sm_clock' in gpu:
-            metrics.append(f'# HELP gpu_sm_clock GPU SM clock in MHz')
-            metrics.append(f'# TYPE gpu_sm_clock gauge')
-            metrics.append(f'gpu_sm_clock{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("sm_clock", 0))}')
+            families['gpu_sm_clock'] += b'gpu_sm_clock{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("sm_clock", 0))))
         
         # PCIe пропускная способность
         if 'pcie_tx' in gpu:
-            metrics.append(f'# HELP gpu_pcie_tx PCIe TX throughput in bytes per second')
-            metrics.append(f'# TYPE gpu_pcie_tx gauge')
-            metrics.append(f'gpu_pcie_tx{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("pcie_tx", 0))}')
-        
+            families['gpu_pcie_tx'] += b'gpu_pcie_tx{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("pcie_tx", 0))))
         if 'pcie_rx' in gpu:
-            metrics.append(f'# HELP gpu_pcie_rx PCIe RX throughput in bytes per second')
-            metrics.append(f'# TYPE gpu_pcie_rx gauge')
-            metrics.append(f'gpu_pcie_rx{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("pcie_rx", 0))}')
+            families['gpu_pcie_rx'] += b'gpu_pcie_rx{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("pcie_rx", 0))))
         
         # NVLink пропускная способность
         if 'nvlink_tx' in gpu:
-            metrics.append(f'# HELP gpu_nvlink_tx NVLink TX throughput in bytes per second')
-            metrics.append(f'# TYPE gpu_nvlink_tx gauge')
-            metrics.append(f'gpu_nvlink_tx{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("nvlink_tx", 0))}')
-        
+            families['gpu_nvlink_tx'] += b'gpu_nvlink_tx{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("nvlink_tx", 0))))
         if 'nvlink_rx' in gpu:
-            metrics.append(f'# HELP gpu_nvlink_rx NVLink RX throughput in bytes per second')
-            metrics.append(f'# TYPE gpu_nvlink_rx gauge')
-            metrics.append(f'gpu_nvlink_rx{{gpu="{gpu_index}"}} {safe_numeric(gpu.get("nvlink_rx", 0))}')
-    
-    # Process metrics
-    for process in data['processes']:
-        pid = process['pid']
-        gpu_index = process['gpu_index']
-        container_id = process.get('container_id') or 'Host'
-        container_name = process.get('container_name') or 'Host'
+            families['gpu_nvlink_rx'] += b'gpu_nvlink_rx{gpu="%s"} %s\n' % (gpu_label, format_number(safe_numeric(gpu.get("nvlink_rx", 0))))
+    
+    # Process metrics. On hosts with thousands of processes this is where generation spends
+    # its time, so each family is built with one comprehension over all processes
+    processes = data['processes']
+    
+    # Label set of each process; the escaped container part is shared by the processes of a container
+    container_labels = {}
+    labels = []
+    for process in processes:
+        container = (process.container_id, process.container_name)
+        container_label = container_labels.get(container)
+        if container_label is None:
+            container_label = container_labels[container] = 'container_id="%s",container_name="%s"' % (
+                (process.container_id or 'Host').translate(_LABEL_ESCAPE_TABLE),
+                (process.container_name or 'Host').translate(_LABEL_ESCAPE_TABLE)
+            )
+        labels.append(f'pid="{process.pid}",gpu="{process.gpu_index}",{container_label}'.encode('utf-8'))
+    
+    # Values are formatted a column at a time; integers (memory, utilization) are written
+    # directly instead of through the float conversion. Processes with no value (None) are skipped
+    for name, field in _PROCESS_METRICS:
+        prefix = name.encode('utf-8')
+        values = [getattr(process, field) for process in processes]
+        families[name] += b''.join([
+            b'%s{%s} %s\n' % (prefix, label, b'%d' % value if type(value) is int else format_number(safe_numeric(value)))
+            for value, label in zip(values, labels) if value is not None
+        ])
+    
+    # Container metrics
+    for container_id, container_info in data['multi_gpu_containers'].items():
+        families['container_gpu_count'] += b'container_gpu_count{container_id="%s",container_name="%s"} %d\n' % (
+            container_id.translate(_LABEL_ESCAPE_TABLE).encode('utf-8'),
+            str(container_info["name"]).translate(_LABEL_ESCAPE_TABLE).encode('utf-8'),
+            len(container_info["gpu_indices"])
+        )
+    
+    # Header once per family, families without samples are skipped
+    buf = bytearray()
+    buf_extend = buf.extend
+    for name, samples in families.items():
+        if samples:
+            buf_extend(_METRIC_HEADERS[name])
+            buf_extend(samples)
+    
+    return bytes(buf)
+
+class SnapshotCache:
+    """Encoded response body for the latest data, built once per collected snapshot"""
+    
+    def __init__(self, render):
+        self.render = render
+        # (data timestamp, body bytes, gzip-compressed body bytes)
+        self.entry = (-1.0, None, None)
+        self.lock = threading.Lock()
+    
+    def get(self, data):
+        """Get (body, gzip body) for the data"""
+        timestamp, body, compressed = self.entry
+        if timestamp == data['timestamp']:
+            return body, compressed
+        
+        with self.lock:
+            # Concurrent requests for the same snapshot wait for a single rendering
+            timestamp, body, compressed = self.entry
+            if timestamp != data['timestamp']:
+                body = self.render(data)
+                # Level 1: most of the size reduction for a fraction of the CPU
+                compressed = gzip.compress(body, compresslevel=1)
+                self.entry = (data['timestamp'], body, compressed)
+            return body, compressed
+
+_html_cache = SnapshotCache(generate_html)
+_metrics_cache = SnapshotCache(generate_prometheus_metrics)
+_json_cache = SnapshotCache(json_dumps)
+
+def refresh_data():
+    """Collect data and publish it for the HTTP handlers"""
+    global last_data
+    
+    data = collect_data()
+    
+    # Publish by a single reference assignment, handlers read last_data without locking
+    last_data = data
+
+def measure_activity(previous, current):
+    """Compare two snapshots: max GPU utilization change (%) and whether the process set changed"""
+    previous_util = {gpu['index']: gpu['utilization'] for gpu in previous.get('gpu_info', [])}
+    max_delta = 0
+    for gpu in current['gpu_info']:
+        try:
+            delta = abs(gpu['utilization'] - previous_util[gpu['index']])
+        except (KeyError, TypeError):
+            # New GPU or utilization not available - treat as a change
+            delta = 100
+        max_delta = max(max_delta, delta)
+    
+    previous_processes = {(p.pid, p.gpu_index) for p in previous.get('processes', [])}
+    current_processes = {(p.pid, p.gpu_index) for p in current['processes']}
+    
+    return max_delta, previous_processes != current_processes
+
+def collector_loop(stop_event):
+    """Background loop refreshing the collected data with an adaptive interval"""
+    interval = update_interval
+    idle_refreshes = 0
+    
+    while not stop_event.wait(interval):
+        previous = last_data
+        try:
+            refresh_data()
+        except Exception as e:
+            logger.error(f"Error collecting data: {e}")
+            continue
         
-        metrics.append(f'# HELP gpu_process_memory GPU memory used by a process in bytes')
-        metrics.append(f'# TYPE gpu_process_memory gauge')
-        metrics.append(f'gpu_process_memory{{pid="{pid}",gpu="{gpu_index}",container_id="{container_id}",container_name="{container_name}"}} {safe_numeric(process.get("gpu_memory", 0))}')
+        # Return to the base interval while collection fails
+        if 'error' in last_data or 'error' in previous:
+            interval, idle_refreshes = update_interval, 0
+            continue
+        
+        max_delta, processes_changed = measure_activity(previous, last_data)
+        if max_delta > 10 or processes_changed:
+            # Activity: refresh more often
+            interval, idle_refreshes = max(min_update_interval, interval / 2), 0
+        elif max_delta < 2:
+            # Idle: back off after several quiet refreshes
+            idle_refreshes += 1
+            if idle_refreshes >= idle_refreshes_before_backoff:
+                interval, idle_refreshes = min(max_update_interval, interval * 2), 0
+        else:
+            idle_refreshes = 0
+
+# HTTP server for monitoring
+class EventBroadcaster:
+    """Push new snapshots to all open /events streams from a single thread"""
+    
+    def __init__(self):
+        # Stream socket -> timestamp of the last snapshot queued for it
+        self.clients = {}
+        # Slots taken by streams that are still being started by a worker
+        self.reserved = 0
+        # Stream socket -> (bytes the socket hasn't accepted yet, time of the last progress);
+        # used by the broadcaster thread only
+        self.unsent = {}
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+    
+    def reserve(self):
+        """Reserve a slot for a new stream before its response is started"""
+        with self.lock:
+            if len(self.clients) + self.reserved >= EVENT_STREAMS:
+                return False
+            self.reserved += 1
+            return True
+    
+    def release(self):
+        """Free a reserved slot of a stream that failed to start"""
+        with self.lock:
+            self.reserved -= 1
+    
+    def add(self, sock, timestamp):
+        """Take over a stream in its reserved slot; it has already been sent the snapshot with this timestamp"""
+        with self.lock:
+            self.reserved -= 1
+            # Writes never block, so a stalled client can't hold up the other streams
+            sock.setblocking(False)
+            self.clients[sock] = timestamp
+            # Clients send nothing after the request, so a readable socket means it disconnected
+            self.selector.register(sock, selectors.EVENT_READ)
+    
+    def owns(self, sock):
+        return sock in self.clients
+    
+    def drop(self, sock):
+        with self.lock:
+            if sock not in self.clients:
+                return
+            del self.clients[sock]
+            self.selector.unregister(sock)
+        self.unsent.pop(sock, None)
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+    
+    def send(self, sock, message, since=None):
+        """Write without blocking; what the socket doesn't accept is kept and sent when it becomes writable"""
+        try:
+            sent = sock.send(message)
+        except BlockingIOError:
+            sent = 0
+        if sent == len(message):
+            if since is not None:
+                self.unsent.pop(sock)
+                with self.lock:
+                    self.selector.modify(sock, selectors.EVENT_READ)
+            return
+        if since is None:
+            with self.lock:
+                self.selector.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        if since is None or sent:
+            since = time.time()
+        self.unsent[sock] = (memoryview(message)[sent:], since)
+    
+    def run(self, stop_event):
+        """Broadcast loop, runs until stop_event is set"""
+        last_write = time.time()
+        while not stop_event.is_set():
+            try:
+                last_write = self.broadcast(last_write)
+            except Exception as e:
+                # An error must not stop the thread and leave every open stream hanging
+                logger.error(f"Error broadcasting events: {e}")
+                stop_event.wait(min_update_interval)
         
-        # CPU использование процесса
-        if 'cpu_percent' in process:
-            metrics.append(f'# HELP process_cpu_percent CPU usage percentage by a process')
-            metrics.append(f'# TYPE process_cpu_percent gauge')
-            metrics.append(f'process_cpu_percent{{pid="{pid}",gpu="{gpu_index}",container_id="{container_id}",container_name="{container_name}"}} {safe_numeric(process.get("cpu_percent", 0))}')
+        for sock in list(self.clients):
+            self.drop(sock)
+        self.selector.close()
+    
+    def broadcast(self, last_write):
+        """Serve socket events for up to min_update_interval, then send a new snapshot; returns the last write time"""
+        for key, mask in self.selector.select(timeout=min_update_interval):
+            sock = key.fileobj
+            try:
+                if mask & selectors.EVENT_READ:
+                    self.drop(sock)
+                elif sock in self.unsent:
+                    self.send(sock, *self.unsent[sock])
+            except OSError:
+                self.drop(sock)
         
-        # Использование памяти хоста
-        if 'host_memory' in process:
-            metrics.append(f'# HELP process_host_memory Host memory used by a process in bytes')
-            metrics.append(f'# TYPE process_host_memory gauge')
-            metrics.append(f'process_host_memory{{pid="{pid}",gpu="{gpu_index}",container_id="{container_id}",container_name="{container_name}"}} {safe_numeric(process.get("host_memory", 0))}')
+        # A client that hasn't read anything for 5 seconds is dropped
+        now = time.time()
+        for sock, (_, since) in list(self.unsent.items()):
+            if now - since > 5:
+                self.drop(sock)
         
-        # Время работы процесса
-        if 'running_time' in process:
-            metrics.append(f'# HELP process_running_time Process running time in seconds')
-            metrics.append(f'# TYPE process_running_time gauge')
-            metrics.append(f'process_running_time{{pid="{pid}",gpu="{gpu_index}",container_id="{container_id}",container_name="{container_name}"}} {safe_numeric(process.get("running_time", 0))}')
+        data = last_data
+        # Comment line so that proxies don't close an idle stream
+        keepalive = now - last_write >= 15
+        with self.lock:
+            # Streams with unsent data get the latest snapshot once they catch up
+            clients = [(sock, timestamp) for sock, timestamp in self.clients.items() if sock not in self.unsent]
         
-        # GPU загрузка процесса, если доступна
-        if 'gpu_utilization' in process:
-            metrics.append(f'# HELP process_gpu_utilization GPU utilization percentage by a process')
-            metrics.append(f'# TYPE process_gpu_utilization gauge')
-            metrics.append(f'process_gpu_utilization{{pid="{pid}",gpu="{gpu_index}",container_id="{container_id}",container_name="{container_name}"}} {safe_numeric(process.get("gpu_utilization", 0))}')
+        message = None
+        for sock, timestamp in clients:
+            try:
+                if timestamp != data['timestamp']:
+                    if message is None:
+                        message = b'data: ' + _json_cache.get(data)[0] + b'\n\n'
+                    self.send(sock, message)
+                    with self.lock:
+                        self.clients[sock] = data['timestamp']
+                    last_write = now
+                elif keepalive:
+                    self.send(sock, b': keepalive\n\n')
+                    last_write = now
+            except OSError:
+                self.drop(sock)
+        return last_write
+
+class ConnectionWatcher:
+    """Wait for requests on idle connections in a single thread and dispatch readable ones"""
     
-    # Container metrics
-    for container_id, container_info in data['multi_gpu_containers'].items():
-        metrics.append(f'# HELP container_gpu_count Number of GPUs used by a container')
-        metrics.append(f'# TYPE container_gpu_count gauge')
-        metrics.append(f'container_gpu_count{{container_id="{container_id}",container_name="{container_info["name"]}"}} {len(container_info["gpu_indices"])}')
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+        self.selector = selectors.DefaultSelector()
+        # Idle socket -> (client address, time by which a request has to arrive, kept alive after a request)
+        self.waiting = {}
+        # Number of kept-alive connections in waiting
+        self.parked = 0
+        self.lock = threading.Lock()
+    
+    def add(self, sock, client_address, timeout, keepalive=False):
+        """Watch a connection until it becomes readable or the timeout expires"""
+        evicted = None
+        with self.lock:
+            # Sockets are kept in the order they started waiting
+            if keepalive and self.parked >= MAX_KEEPALIVE_CONNECTIONS:
+                # Kept-alive connections only make room among themselves, new clients are never crowded out
+                evicted = next(other for other, entry in self.waiting.items() if entry[2])
+            elif len(self.waiting) >= MAX_IDLE_CONNECTIONS:
+                evicted = next(iter(self.waiting))
+            if evicted is not None:
+                self.forget(evicted)
+            self.waiting[sock] = (client_address, time.monotonic() + timeout, keepalive)
+            self.parked += keepalive
+            self.selector.register(sock, selectors.EVENT_READ)
+        if evicted is not None:
+            self.close(evicted)
+    
+    def forget(self, sock):
+        """Stop watching a socket, called with the lock held; returns its client address"""
+        client_address, _, keepalive = self.waiting.pop(sock)
+        self.parked -= keepalive
+        self.selector.unregister(sock)
+        return client_address
+    
+    def close(self, sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
     
-    return '\n'.join(metrics)
+    def run(self, stop_event):
+        """Dispatch loop, runs until stop_event is set"""
+        while not stop_event.is_set():
+            # epoll also reports sockets registered while select() is waiting
+            ready = self.selector.select(timeout=1)
+            now = time.monotonic()
+            with self.lock:
+                # Skip sockets evicted by add() after select() returned
+                readable = [(key.fileobj, self.forget(key.fileobj)) for key, _ in ready if key.fileobj in self.waiting]
+                expired = [sock for sock, (_, deadline, _) in self.waiting.items() if deadline <= now]
+                for sock in expired:
+                    self.forget(sock)
+            
+            for sock, client_address in readable:
+                self.dispatch(sock, client_address)
+            for sock in expired:
+                self.close(sock)
+        
+        with self.lock:
+            socks = list(self.waiting)
+            self.waiting.clear()
+        for sock in socks:
+            self.close(sock)
+        self.selector.close()
 
-# HTTP server for monitoring
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
-    """Handle requests in separate threads"""
+    """Handle requests on a fixed pool of worker threads"""
     daemon_threads = True
+    # The accept loop never waits, so the listen backlog only absorbs bursts of new connections
+    request_queue_size = 16
+    
+    def __init__(self, server_address, handler_class):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix='http')
+        # (future, socket) of dispatched connections, oldest first; only the watcher thread uses it
+        self.queued = deque()
+        self.stopping = threading.Event()
+        # Connections wait for their request in one watcher thread, so silent ones don't hold workers
+        self.connections = ConnectionWatcher(self.dispatch_request)
+        threading.Thread(target=self.connections.run, args=(self.stopping,), name='connections', daemon=True).start()
+        # Event streams are served by one broadcaster thread instead of holding workers
+        self.events = EventBroadcaster()
+        threading.Thread(target=self.events.run, args=(self.stopping,), name='events', daemon=True).start()
+    
+    def process_request(self, request, client_address):
+        """Watch the new connection until its request arrives, the accept loop never waits"""
+        self.connections.add(request, client_address, REQUEST_TIMEOUT)
+    
+    def dispatch_request(self, request, client_address):
+        """Hand a connection with a pending request to a worker thread"""
+        # Forget connections that workers have already taken
+        while self.queued and (self.queued[0][0].running() or self.queued[0][0].done()):
+            self.queued.popleft()
+        self.queued.append((self._pool.submit(self.process_request_thread, request, client_address), request))
+        
+        # While all workers are busy the executor queue is unbounded, so the oldest waiting connection is dropped
+        if len(self.queued) > MAX_QUEUED_REQUESTS:
+            future, oldest = self.queued.popleft()
+            if future.cancel():
+                self.shutdown_request(oldest)
+    
+    def process_request_thread(self, request, client_address):
+        """Serve the requests that have arrived on a connection in a worker thread"""
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        if handler.idle:
+            # A kept-alive connection goes back to the watcher until its next request
+            self.connections.add(request, client_address, KEEPALIVE_TIMEOUT, keepalive=True)
+        else:
+            self.shutdown_request(request)
+    
+    def shutdown_request(self, request):
+        # Streams handed over to the broadcaster stay open
+        if self.events.owns(request):
+            return
+        super().shutdown_request(request)
+    
+    def server_close(self):
+        # Close idle connections and open event streams
+        self.stopping.set()
+        super().server_close()
+        self._pool.shutdown(wait=False)
 
 class RequestHandler(BaseHTTPRequestHandler):
     """HTTP request handler for monitoring"""
+    # HTTP/1.1 keeps connections open between requests, so scrapers reuse them
+    protocol_version = 'HTTP/1.1'
+    # Socket timeout while a request is read and answered; idle time is limited by the watcher
+    timeout = REQUEST_TIMEOUT
+    
+    def handle(self):
+        """Handle the requests that have arrived, then leave an idle connection to the server"""
+        self.idle = False
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            # A pipelined request may already be buffered in rfile and has to be served here
+            if not self.request_buffered():
+                self.idle = True
+                return
+            self.handle_one_request()
+    
+    def request_buffered(self):
+        """Check without blocking whether the next request has already arrived"""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+    
+    def end_headers_with_body(self, body):
+        """Finish the headers and send them together with the body in a single write"""
+        if hasattr(self, '_headers_buffer'):
+            self._headers_buffer.append(b'\r\n')
+            self._headers_buffer.append(body)
+            self.flush_headers()
+        else:
+            # HTTP/0.9 request: no headers were buffered
+            self.wfile.write(body)
     
     def do_GET(self):
         """Handle GET requests"""
         parsed_url = urlparse(self.path)
         path = parsed_url.path
         
-        # Get data
-        data = collect_data()
+        # Latest data published by the collector thread
+        data = last_data
         
         # Handle different endpoints
         if path == '/' or path == '/index.html':
             # HTML page
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(generate_html(data).encode('utf-8'))
+            self.send_snapshot(_html_cache, data, 'text/html; charset=utf-8')
         
         elif path == '/metrics':
             # Prometheus metrics
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/plain; charset=utf-8')
-            self.end_headers()
-            self.wfile.write(generate_prometheus_metrics(data).encode('utf-8'))
+            self.send_snapshot(_metrics_cache, data, 'text/plain; charset=utf-8')
         
         elif path == '/api/data.json':
             # JSON API
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(data).encode('utf-8'))
+            self.send_snapshot(_json_cache, data, 'application/json')
+        
+        elif path == '/events':
+            # Live page updates
+            self.send_events()
+        
+        elif path == '/healthz':
+            # Health check: the collector thread is alive and the last collection succeeded
+            age = time.time() - data['timestamp']
+            healthy = 'error' not in data and age <= health_max_age
+            self.send_body(200 if healthy else 503, 'application/json', json_dumps({
+                'status': 'ok' if healthy else 'unhealthy',
+                'age': round(age, 1),
+                'error': data.get('error')
+            }))
         
         else:
             # Page not found
-            self.send_response(404)
-            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_body(404, 'text/html; charset=utf-8', b"<html><body><h1>404 Not Found</h1></body></html>")
+    
+    def send_events(self):
+        """Start a Server-Sent Events stream and hand it over to the broadcaster"""
+        # The slot is taken before the response starts, so a full broadcaster
+        # always answers 503 and the page falls back to polling /api/data.json
+        if not self.server.events.reserve():
+            self.send_body(503, 'text/plain; charset=utf-8', b"Too many event streams")
+            return
+        
+        added = False
+        try:
+            # The stream has no length and is never followed by another request
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
             self.end_headers()
-            self.wfile.write(b"<html><body><h1>404 Not Found</h1></body></html>")
+            
+            # The current snapshot is sent right away, the broadcaster sends the following ones
+            data = last_data
+            try:
+                self.wfile.write(b'data: ' + _json_cache.get(data)[0] + b'\n\n')
+            except (BrokenPipeError, ConnectionResetError):
+                # Client closed the page
+                return
+            self.server.events.add(self.connection, data['timestamp'])
+            added = True
+        finally:
+            if not added:
+                self.server.events.release()
+    
+    def send_body(self, code, content_type, body):
+        """Send a small uncached response"""
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers_with_body(body)
+    
+    def send_snapshot(self, cache, data, content_type):
+        """Send the cached body for the data, gzip-compressed if the client accepts it"""
+        body, compressed = cache.get(data)
+        use_gzip = self.accepts_gzip()
+        
+        # Responses only change when new data is collected, so the data timestamp is the ETag;
+        # the compressed body is a different representation and gets its own tag
+        etag = f'"{data["timestamp"]}-gzip"' if use_gzip else f'"{data["timestamp"]}"'
+        if self.not_modified(etag):
+            return
+        
+        if use_gzip:
+            body = compressed
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_cache_headers(etag)
+        self.end_headers_with_body(body)
+    
+    def accepts_gzip(self):
+        """Check whether the client accepts a gzip-encoded response"""
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.partition(';')
+            if name.strip().lower() != 'gzip':
+                continue
+            # gzip;q=0 means "not acceptable"
+            params = params.replace(' ', '')
+            try:
+                return not params.startswith('q=') or float(params[2:]) > 0
+            except ValueError:
+                return False
+        return False
+    
+    def not_modified(self, etag):
+        """Send 304 Not Modified if the client already has this version of the resource"""
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if etag not in tags and '*' not in tags:
+            return False
+        self.send_response(304)
+        self.send_cache_headers(etag)
+        self.end_headers()
+        return True
+    
+    def send_cache_headers(self, etag):
+        """Let clients cache the response but revalidate it on every request"""
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
     
     def log_message(self, format, *args):
         """Override request logging"""
@@ -1053,20 +1840,33 @@ class RequestHandler(BaseHTTPRequestHandler):
 
 def main():
     """Main program function"""
+    # Log records are written to stdout by a listener thread; request handlers and
+    # the collector only put them on a queue and don't wait for the write
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    log_listener = QueueListener(log_queue, *root_logger.handlers)
+    root_logger.handlers = [QueueHandler(log_queue)]
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    
     logger.info(f"Starting Proxmox-GML (GPU Monitoring for LXC) server on port {PORT}")
+    logger.info(f"Using nvitop {nvitop_version} ({sys.executable})")
     
-    # Check if nvitop is working
+    # Initialize NVML once for the lifetime of the server
     try:
-        test_script = "import nvitop; print('nvitop is working')"
-        output = run_nvitop_script(test_script)
-        if not output or "nvitop is working" not in output:
-            logger.error("Failed to import nvitop. Check your installation.")
-            sys.exit(1)
-        logger.info("nvitop is working correctly")
+        libnvml.nvmlInit()
+        atexit.register(libnvml.nvmlShutdown)
+        logger.info("NVML initialized successfully")
     except Exception as e:
-        logger.error(f"Error checking nvitop: {e}")
+        logger.error(f"Error initializing NVML: {e}")
         sys.exit(1)
     
+    # Collect the first snapshot before serving, then keep refreshing in the background
+    refresh_data()
+    stop_event = threading.Event()
+    collector = threading.Thread(target=collector_loop, args=(stop_event,), name='collector', daemon=True)
+    collector.start()
+    
     # Start web server
     try:
         server = ThreadedHTTPServer(('0.0.0.0', PORT), RequestHandler)
@@ -1076,6 +1876,7 @@ def main():
         server.serve_forever()
     except KeyboardInterrupt:
         logger.info("Server stopped")
+        stop_event.set()
         server.server_close()
     except Exception as e:
         logger.error(f"Error starting server: {e}")